@@ -0,0 +1,32 @@
+import pytest
+
+
+# command line options have to be registered in a conftest.py at the rootdir,
+# pytest only picks up the one in xvec/tests once collection has started
+def pytest_addoption(parser):
+    parser.addoption(
+        "--skip-network",
+        action="store_true",
+        default=False,
+        help="skip tests that download remote data",
+    )
+    parser.addoption(
+        "--runslow", action="store_true", default=False, help="run slow tests"
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "requires_network: marks tests that download remote data"
+    )
+    config.addinivalue_line("markers", "slow: marks tests as slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    skip_network = pytest.mark.skip(reason="--skip-network was given")
+    skip_slow = pytest.mark.skip(reason="need --runslow option to run")
+    for item in items:
+        if config.getoption("--skip-network") and "requires_network" in item.keywords:
+            item.add_marker(skip_network)
+        if not config.getoption("--runslow") and "slow" in item.keywords:
+            item.add_marker(skip_slow)